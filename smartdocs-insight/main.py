@@ -15,20 +15,25 @@ Author: Damian Komorowski
 from __future__ import annotations
 
 import csv
+import functools
+import heapq
 import json
 import logging
 import os
 import re
+import threading
 import time
 import webbrowser
 from datetime import datetime
-from typing import List, Tuple
+from typing import Callable, Iterator, List, Set, Tuple
 
 import fitz  # PyMuPDF
-import openpyxl
 import pycountry
 import pyperclip
+import xlsxwriter
+from xlsxwriter.exceptions import FileCreateError
 import tkinter as tk
+import tkinter.font as tkfont
 from tkinter import filedialog, messagebox, ttk
 
 
@@ -52,12 +57,54 @@ DEFAULT_DOC_URL = os.getenv(
     "SMARTDOCS_DOC_URL", "https://example.com/internal-docs"
 )
 
+
+def _init_logger(name: str) -> logging.Logger | None:
+    """
+    Create a SmartDocs logger writing to SmartDocs.log next to this module.
+
+    Called once per logger at import time so GUI actions do not repeat the
+    logging setup on every call. Returns None if logging cannot be set up.
+    """
+    try:
+        logger = logging.getLogger(name)
+        if not logging.getLogger().handlers:
+            log_path = os.path.join(
+                os.path.dirname(os.path.abspath(__file__)), "SmartDocs.log"
+            )
+            logging.basicConfig(
+                filename=log_path,
+                level=logging.INFO,
+                format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+            )
+        if os.getenv("SMARTDOCS_DEBUG", "0") == "1":
+            logger.setLevel(logging.DEBUG)
+        return logger
+    except Exception:
+        return None
+
+
+_SELECT_LOGGER = _init_logger("SmartDocs.Select")
+_EXPORT_LOGGER = _init_logger("SmartDocs.Export")
+
 # Path to preferences file in the same folder as this module
 prefs_file_path = os.path.join(
     os.path.dirname(os.path.abspath(__file__)), "user_preferences.json"
 )
 
 
+def _write_prefs(prefs: dict) -> None:
+    """
+    Atomically write preferences to the JSON file.
+
+    The data is written to a temporary file first and then swapped in with
+    os.replace, so an interrupted write never leaves a truncated file behind.
+    """
+    tmp_path = f"{prefs_file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(prefs, f, indent=4)
+    os.replace(tmp_path, prefs_file_path)
+
+
 def _ensure_prefs_file_exists() -> dict:
     """
     Load preferences from JSON file. If the file does not exist or is invalid,
@@ -81,8 +128,7 @@ def _ensure_prefs_file_exists() -> dict:
 
     # Persist back (create or fix invalid file)
     try:
-        with open(prefs_file_path, "w", encoding="utf-8") as f:
-            json.dump(prefs, f, indent=4)
+        _write_prefs(prefs)
     except Exception as e:
         print(f"⚠️ Failed to initialize preferences file: {e}")
 
@@ -93,46 +139,90 @@ _prefs_cache = _ensure_prefs_file_exists()
 initial_dark_mode: bool = bool(_prefs_cache.get("dark_mode", True))
 
 # EU ISO country codes (alpha-2)
-EU_CODES = {
-    "AT",
-    "BE",
-    "BG",
-    "HR",
-    "CY",
-    "CZ",
-    "DK",
-    "EE",
-    "FI",
-    "FR",
-    "DE",
-    "GR",
-    "HU",
-    "IE",
-    "IT",
-    "LV",
-    "LT",
-    "LU",
-    "MT",
-    "NL",
-    "PL",
-    "PT",
-    "RO",
-    "SK",
-    "SI",
-    "ES",
-    "SE",
+EU_CODES = frozenset(
+    {
+        "AT",
+        "BE",
+        "BG",
+        "HR",
+        "CY",
+        "CZ",
+        "DK",
+        "EE",
+        "FI",
+        "FR",
+        "DE",
+        "GR",
+        "HU",
+        "IE",
+        "IT",
+        "LV",
+        "LT",
+        "LU",
+        "MT",
+        "NL",
+        "PL",
+        "PT",
+        "RO",
+        "SK",
+        "SI",
+        "ES",
+        "SE",
+    }
+)
+
+# Preferred display names for COO codes, used before falling back to pycountry
+_COUNTRY_NAME_OVERRIDES = {
+    "MX": "Mexico",
+    "MY": "Malaysia",
+    "PL": "Poland",
+    "KR": "Republic of Korea",
 }
 
+# Language variants of the "customer ID" label preceding the BPID in invoice PDFs
+CUSTOMER_ID_LABELS = (
+    "Vs. Codice Cliente",
+    "Your Customer ID",
+    "N° Compte Client",
+    "Kundennummer",
+    "Uw Klantnummer",
+    "Nº Cliente",
+)
+
+# Single alternation matching any of the labels above
+_CUSTOMER_ID_LABEL_RE = re.compile("|".join(map(re.escape, CUSTOMER_ID_LABELS)))
+
+# Regex for COO/weight information, e.g.: "/ MX / 2.497 KG"
+_COO_WEIGHT_RE = re.compile(
+    r"/\s*(?P<coo>[A-Za-z]{2})\s*/\s*(?P<weight>[\d.,]+)\s*(?P<unit>KG|KGS|G|GRAMS?)\b",
+    re.IGNORECASE,
+)
+
+# One field of a "Missing COO" alert, e.g. "Line 10" or "Product: 1756-L81E"
+_COO_FIELD_RE = re.compile(r"^(LINE|PRODUCT|DESC|WEIGHT)\s*[: ]\s*(.*)$", re.IGNORECASE)
+
+# Parenthesized suffixes such as "(1)" in invoice file names
+_SIG_PAREN_RE = re.compile(r"\(.*?\)")
+
+# Export prefixes of invoice CSV and PDF file names
+_INV_PREFIX_RE = re.compile(r"^(?:INV_CSV_|INV_PDF_D_)")
+
+# Marks analyze_invoice failures inside its missing-COO list
+_ANALYSIS_ERROR_PREFIX = "Error during analysis:"
+
 
 # ---------------------------------------------------------------------------
 # Helper functions – country & invoice analysis
 # ---------------------------------------------------------------------------
 
 
+@functools.lru_cache(maxsize=512)
 def get_country_name(code: str) -> str:
     """
     Convert a two-letter country code into a human-readable country name.
 
+    Results are memoized, as the same few COO codes repeat across line items.
+
     Args:
         code: ISO alpha-2 country code (e.g. 'PL', 'MX').
 
@@ -149,12 +239,80 @@ def get_country_name(code: str) -> str:
         return code
 
 
+def split_invoice_files(file_paths: List[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split selected paths into CSV and PDF files in a single pass.
+
+    Returns:
+        tuple:
+            csv_files: list[str]
+            pdf_files: list[str]
+    """
+    csv_files: List[str] = []
+    pdf_files: List[str] = []
+    for path in file_paths:
+        # rpartition keeps dotfiles such as ".csv" classified, like endswith did
+        ext = path.rpartition(".")[2].lower()
+        if ext == "csv":
+            csv_files.append(path)
+        elif ext == "pdf":
+            pdf_files.append(path)
+    return csv_files, pdf_files
+
+
+@functools.lru_cache(maxsize=64)
+def _read_csv_rows(file_path: str, mtime: float) -> Tuple[List[str], ...]:
+    """
+    Read and cache all rows of a CSV file.
+
+    The analysis and the Excel export both parse the same invoice CSVs, so the
+    rows are memoized per (path, mtime); editing a file invalidates its entry.
+    Uses utf-8-sig so a BOM at file start is stripped automatically.
+
+    Tradeoff: each cached file is held fully in memory, so callers going
+    through this cache do not stream rows. The cache only exists to hand the
+    rows from the analysis to the export: the GUI only analyzes through it when
+    the export is enabled and clears it once a selection has been processed
+    (see show_gui), so it never grows past one selection.
+
+    Args:
+        file_path: Path to the CSV file.
+        mtime: Modification time of the file, used only as part of the cache key.
+
+    Returns:
+        tuple: Parsed rows; callers must treat them as read-only.
+    """
+    with open(file_path, newline="", encoding="utf-8-sig") as csvfile:
+        return tuple(csv.reader(csvfile))
+
+
+def _cached_csv_rows(file_path: str) -> Tuple[List[str], ...]:
+    """
+    Return the cached rows of a CSV file, reading it on a cache miss.
+    """
+    return _read_csv_rows(file_path, os.path.getmtime(file_path))
+
+
+def _stream_csv_rows(file_path: str) -> Iterator[List[str]]:
+    """
+    Yield the rows of a CSV file one at a time, bypassing the row cache.
+    """
+    with open(file_path, newline="", encoding="utf-8-sig") as csvfile:
+        yield from csv.reader(csvfile)
+
+
 def analyze_invoice(
     file_path: str,
+    cache_rows: bool = True,
 ) -> Tuple[List[str], List[str], float, str, str, List[str]]:
     """
     Parse an invoice CSV file and return structured classification data.
 
+    Args:
+        file_path: Path to the CSV file.
+        cache_rows: Read through the row cache so a following export can reuse
+            the parsed rows; when False the file is streamed row by row.
+
     Returns:
         tuple:
             non_eu_items: list[str]
@@ -172,7 +330,8 @@ def analyze_invoice(
     """
 
     def _norm(s: str) -> str:
-        # Trim, remove UTF-8 BOM if present, uppercase for comparisons
+        # Trim, remove UTF-8 BOM if present, uppercase for comparisons.
+        # Only used for the header cell; ITEM rows are checked inline.
         return (s or "").strip().lstrip("\ufeff").upper()
 
     non_eu_items: List[str] = []
@@ -182,33 +341,29 @@ def analyze_invoice(
     box5_values = set()
     missing_coo_alerts: List[str] = []
 
-    # Regex for COO/weight information, e.g.: "/ MX / 2.497 KG"
-    coo_weight_pattern = re.compile(
-        r"/\s*(?P<coo>[A-Za-z]{2})\s*/\s*(?P<weight>[\d.,]+)\s*(?P<unit>KG|KGS|G|GRAMS?)\b",
-        re.IGNORECASE,
-    )
-
     try:
-        # Use utf-8-sig so BOM at file start is stripped automatically
-        with open(file_path, newline="", encoding="utf-8-sig") as csvfile:
-            reader = csv.reader(csvfile)
-            lines = list(reader)
+        rows = (
+            iter(_cached_csv_rows(file_path))
+            if cache_rows
+            else _stream_csv_rows(file_path)
+        )
+        header_row = next(rows, [])
 
         # ---- Invoice reference (prefer B1; guarded header check) ----
-        if len(lines) > 0 and len(lines[0]) > 1:
-            invoice_reference = (lines[0][1] or "").strip()
+        if len(header_row) > 1:
+            invoice_reference = (header_row[1] or "").strip()
 
             if not invoice_reference:
-                first_cell = _norm(lines[0][0])
+                first_cell = _norm(header_row[0])
                 if first_cell in {"HEADER", "INVOICE", "INV"}:
-                    invoice_reference = (lines[0][1] or "").strip()
-
-        # ---- Iterate all rows; only handle those starting with 'ITEM' ----
-        for row in lines:
-            if not row:
-                continue
-
-            if _norm(row[0]) != "ITEM":
+                    invoice_reference = (header_row[1] or "").strip()
+
+        # ---- Iterate remaining rows; only handle those starting with 'ITEM' ----
+        for row in rows:
+            # The utf-8-sig codec already strips the BOM, so a plain
+            # strip/upper is enough here (no per-row _norm call)
+            first_cell = row[0] if row else ""
+            if not first_cell or first_cell.strip().upper() != "ITEM":
                 continue
 
             # Defensive extraction with column guards
@@ -223,24 +378,27 @@ def analyze_invoice(
 
             # COO/weight field is column Q (index 16) by the sample CSV
             coo_weight_field = row[16].strip() if len(row) > 16 and row[16] else ""
-            match = coo_weight_pattern.search(coo_weight_field)
+
+            # Without a slash the field can neither match nor raise an alert,
+            # so the regex is only run on slash-delimited COO/weight entries
+            if "/" not in coo_weight_field:
+                continue
+
+            match = _COO_WEIGHT_RE.search(coo_weight_field)
 
             # If slashes are present but COO isn't matched → alert as "Missing COO"
             if not match:
-                if "/" in coo_weight_field:
-                    line_number = row[1].strip() if len(row) > 1 and row[1] else "Unknown"
-                    weight_info = coo_weight_field
-                    if "/" in weight_info:
-                        # Take the last part after the last slash (likely the "weight unit" chunk)
-                        weight_info = weight_info.split("/")[-1].strip()
-                    weight_info = " ".join(weight_info.split())  # normalize spaces
-
-                    missing_coo_alerts.append(
-                        f"⚠️ Missing COO → Line {line_number}\n"
-                        f" Product: {catalog}\n"
-                        f" Desc: {description}\n"
-                        f" Weight: {weight_info}"
-                    )
+                line_number = row[1].strip() if len(row) > 1 and row[1] else "Unknown"
+                # Take the last part after the last slash (likely the "weight unit" chunk)
+                weight_info = coo_weight_field.split("/")[-1].strip()
+                weight_info = " ".join(weight_info.split())  # normalize spaces
+
+                missing_coo_alerts.append(
+                    f"⚠️ Missing COO → Line {line_number}\n"
+                    f" Product: {catalog}\n"
+                    f" Desc: {description}\n"
+                    f" Weight: {weight_info}"
+                )
                 # Skip this line for COO processing if not matched
                 continue
 
@@ -258,12 +416,7 @@ def analyze_invoice(
                 weight_value = 0.0
 
             # Determine country name
-            special_names = {"KR": "Republic of Korea"}
-            country_name = {
-                "MX": "Mexico",
-                "MY": "Malaysia",
-                "PL": "Poland",
-            }.get(coo, special_names.get(coo, get_country_name(coo)))
+            country_name = _COUNTRY_NAME_OVERRIDES.get(coo) or get_country_name(coo)
 
             item_text = f"{catalog}, {description}, {country_name}"
 
@@ -285,9 +438,103 @@ def analyze_invoice(
         )
 
     except (PermissionError, OSError, UnicodeDecodeError, csv.Error) as e:
-        return ([], [], 0.0, "Unknown", "Unknown", [f"Error during analysis: {e}"])
+        return ([], [], 0.0, "Unknown", "Unknown", [f"{_ANALYSIS_ERROR_PREFIX} {e}"])
     except Exception as e:
-        return ([], [], 0.0, "Unknown", "Unknown", [f"Error during analysis: {e}"])
+        return ([], [], 0.0, "Unknown", "Unknown", [f"{_ANALYSIS_ERROR_PREFIX} {e}"])
+
+
+def _safe_analyze(
+    file_path: str, cache_rows: bool = True
+) -> Tuple[str, bool, object]:
+    """
+    Run analyze_invoice without letting exceptions escape the analysis thread.
+
+    Returns:
+        tuple:
+            file_path: str
+            ok: bool
+            payload: analyze_invoice result if ok, otherwise the exception
+    """
+    try:
+        return file_path, True, analyze_invoice(file_path, cache_rows)
+    except Exception as e:
+        return file_path, False, e
+
+
+def extract_csv_header(
+    file_path: str,
+    rows: Tuple[List[str], ...] | None = None,
+) -> Tuple[str, str]:
+    """
+    Read the customer name and invoice number from the first two CSV rows.
+
+    When the caller already holds the parsed rows (e.g. from the row cache)
+    they are used directly. Otherwise only those two rows are parsed, so
+    header-only lookups do not pay for a full file scan.
+
+    Args:
+        file_path: Path to the CSV file.
+        rows: Already parsed rows of the same file, if available.
+
+    Returns:
+        customer_name: str
+        invoice_number: str
+
+    Raises:
+        OSError, UnicodeDecodeError, csv.Error: If the file cannot be read.
+    """
+    if rows is not None:
+        first_row = rows[0] if len(rows) > 0 else []
+        second_row = rows[1] if len(rows) > 1 else []
+    else:
+        with open(file_path, newline="", encoding="utf-8-sig") as csvfile:
+            reader = csv.reader(csvfile)
+            first_row = next(reader, [])
+            second_row = next(reader, [])
+
+    invoice_number = (first_row[1] or "").strip() if len(first_row) > 1 else ""
+    customer_name = (second_row[1] or "").strip() if len(second_row) > 1 else ""
+    return customer_name, invoice_number
+
+
+def extract_csv_po_so(file_path: str) -> List[Tuple[str, str]]:
+    """
+    Collect unique (PO, SO) pairs from the line items of an invoice CSV.
+
+    Returns:
+        list[(PO, SO)]: Pairs in order of first appearance.
+
+    Raises:
+        OSError, UnicodeDecodeError, csv.Error: If the file cannot be read.
+    """
+    po_so_pairs: List[Tuple[str, str]] = []
+    seen = set()
+
+    # Line items start at row 8; skip the header block
+    rows = iter(_cached_csv_rows(file_path))
+    for _ in range(7):
+        next(rows, None)
+
+    # Extract PO and SO pairs from columns J and N (index 9 and 13)
+    for row in rows:
+        if not row:
+            continue
+
+        po = row[9].strip() if len(row) > 9 and row[9] else ""
+        so_full = row[13].strip() if len(row) > 13 and row[13] else ""
+
+        if not po or not so_full:
+            continue
+
+        # Remove suffix like "-000010"
+        so = so_full.split("-")[0].strip()
+        key = (po, so)
+
+        if key not in seen:
+            seen.add(key)
+            po_so_pairs.append(key)
+
+    return po_so_pairs
 
 
 def extract_csv_metadata(
@@ -296,10 +543,13 @@ def extract_csv_metadata(
     """
     Extract metadata from an invoice CSV file.
 
+    Combines extract_csv_header and extract_csv_po_so; read errors are
+    reported through the returned error string instead of being raised.
+
     Returns:
         customer_name: str
         invoice_number: str
-        po_so_pairs: list[(PO, SO)]
+        po_so_pairs: list[(PO, SO)], unique and in order of first appearance
         error: str | None
     """
     customer_name = ""
@@ -308,36 +558,11 @@ def extract_csv_metadata(
     error: str | None = None
 
     try:
-        with open(file_path, newline="", encoding="utf-8") as csvfile:
-            reader = csv.reader(csvfile)
-            lines = list(reader)
-
-        # Extract invoice number and customer name from header lines
-        if len(lines) > 0 and len(lines[0]) > 1:
-            invoice_number = (lines[0][1] or "").strip()
-        if len(lines) > 1 and len(lines[1]) > 1:
-            customer_name = (lines[1][1] or "").strip()
-
-        # Extract PO and SO pairs from columns J and N (index 9 and 13)
-        seen = set()
-        for row in lines[7:]:
-            if not row:
-                continue
-
-            po = row[9].strip() if len(row) > 9 and row[9] else ""
-            so_full = row[13].strip() if len(row) > 13 and row[13] else ""
-
-            if not po or not so_full:
-                continue
-
-            # Remove suffix like "-000010"
-            so = so_full.split("-")[0].strip()
-            key = (po, so)
-
-            if key not in seen:
-                seen.add(key)
-                po_so_pairs.append(key)
-
+        # The line items need the full file anyway; read it once through the
+        # cache (usually warm from the analysis) and share it with the header.
+        rows = _cached_csv_rows(file_path)
+        customer_name, invoice_number = extract_csv_header(file_path, rows)
+        po_so_pairs = extract_csv_po_so(file_path)
     except (PermissionError, OSError, UnicodeDecodeError, csv.Error) as e:
         error = f"Error reading CSV: {e}"
     except Exception as e:
@@ -351,20 +576,11 @@ def extract_bpid_from_pdf(file_path: str) -> str:
     Extract BPID / customer ID from an invoice PDF.
 
     The function scans for known language variants of "customer ID" labels and
-    returns the first numeric (or non-empty) line directly following the label.
+    returns the first non-empty line following the label in reading order.
 
     Returns:
         str: Extracted BPID as string, or an empty string if not found.
     """
-    customer_id_labels = [
-        "Vs. Codice Cliente",
-        "Your Customer ID",
-        "N° Compte Client",
-        "Kundennummer",
-        "Uw Klantnummer",
-        "Nº Cliente",
-    ]
-
     try:
         doc = fitz.open(file_path)
     except Exception:
@@ -378,16 +594,10 @@ def extract_bpid_from_pdf(file_path: str) -> str:
                 continue
 
             for i, line in enumerate(lines):
-                for label in customer_id_labels:
-                    if label in line:
-                        # Search for the next non-empty line; prefer numeric-only if available
-                        for j in range(i + 1, len(lines)):
-                            next_line = (lines[j] or "").strip()
-                            if not next_line:
-                                continue
-                            if next_line.isdigit():
-                                return next_line
-                            # If not purely digits but present, return it anyway
+                if _CUSTOMER_ID_LABEL_RE.search(line):
+                    for next_line in lines[i + 1 :]:
+                        next_line = (next_line or "").strip()
+                        if next_line:
                             return next_line
 
     except Exception:
@@ -408,37 +618,25 @@ def extract_bpid_from_pdf(file_path: str) -> str:
 
 def increment_invoice_analysis_counter() -> None:
     """
-    Increment the invoice analysis counter stored in the preferences file.
+    Increment the invoice analysis counter and persist it.
     """
     try:
-        if os.path.exists(prefs_file_path):
-            with open(prefs_file_path, "r", encoding="utf-8") as f:
-                prefs = json.load(f)
-        else:
-            prefs = {}
-
-        prefs["invoice_analysis_count"] = prefs.get("invoice_analysis_count", 0) + 1
-
-        with open(prefs_file_path, "w", encoding="utf-8") as f:
-            json.dump(prefs, f, indent=4)
+        _prefs_cache["invoice_analysis_count"] = get_invoice_analysis_count() + 1
+        _write_prefs(_prefs_cache)
     except Exception as e:
         print(f"⚠️ Failed to increment invoice analysis counter: {e}")
 
 
 def get_invoice_analysis_count() -> int:
     """
-    Read the invoice analysis counter from the preferences file.
+    Read the invoice analysis counter from the in-memory preferences.
 
     Returns:
         int: Number of invoices processed so far.
     """
     try:
-        if os.path.exists(prefs_file_path):
-            with open(prefs_file_path, "r", encoding="utf-8") as f:
-                prefs = json.load(f)
-            return int(prefs.get("invoice_analysis_count", 0))
-        return 0
-    except Exception as e:
+        return int(_prefs_cache.get("invoice_analysis_count", 0))
+    except (TypeError, ValueError) as e:
         print(f"⚠️ Failed to read invoice analysis count: {e}")
         return 0
 
@@ -451,17 +649,8 @@ def reset_invoice_analysis_counter() -> bool:
         bool: True if successful, otherwise False.
     """
     try:
-        if os.path.exists(prefs_file_path):
-            with open(prefs_file_path, "r", encoding="utf-8") as f:
-                prefs = json.load(f)
-        else:
-            prefs = {}
-
-        prefs["invoice_analysis_count"] = 0
-
-        with open(prefs_file_path, "w", encoding="utf-8") as f:
-            json.dump(prefs, f, indent=4)
-
+        _prefs_cache["invoice_analysis_count"] = 0
+        _write_prefs(_prefs_cache)
         return True
     except Exception as e:
         print(f"⚠️ Failed to reset counter: {e}")
@@ -473,16 +662,8 @@ def save_dark_mode_preference(dark_mode_value: bool) -> None:
     Persist the dark_mode preference while keeping all other keys intact.
     """
     try:
-        if os.path.exists(prefs_file_path):
-            with open(prefs_file_path, "r", encoding="utf-8") as f:
-                prefs = json.load(f)
-        else:
-            prefs = {}
-
-        prefs["dark_mode"] = bool(dark_mode_value)
-
-        with open(prefs_file_path, "w", encoding="utf-8") as f:
-            json.dump(prefs, f, indent=4)
+        _prefs_cache["dark_mode"] = bool(dark_mode_value)
+        _write_prefs(_prefs_cache)
     except Exception as e:
         print(f"⚠️ Failed to save dark mode preference: {e}")
 
@@ -520,7 +701,39 @@ def get_responsible_person() -> Tuple[str, bool]:
     window.resizable(True, True)
     window.transient()
     window.grab_set()
-    window.update_idletasks()
+
+    # ttk widgets are styled once here instead of per widget; colors apply
+    # because the main window switches ttk to the "default" theme.
+    style = ttk.Style(window)
+    for style_name, font, foreground in (
+        ("DialogHeader.TLabel", ("Segoe UI", 14, "bold"), fg),
+        ("DialogBold.TLabel", ("Segoe UI", 10, "bold"), fg),
+        ("DialogSubtle.TLabel", ("Segoe UI", 10), subtle),
+        ("DialogFeedback.TLabel", ("Segoe UI", 9), "#ff6666"),
+        ("Dialog.TRadiobutton", ("Segoe UI", 10), fg),
+    ):
+        style.configure(style_name, background=bg, foreground=foreground, font=font)
+    style.map("Dialog.TRadiobutton", background=[("active", bg)])
+
+    style.configure(
+        "Dialog.TButton",
+        background=btn_bg,
+        foreground=fg,
+        font=("Segoe UI", 10, "bold"),
+        relief="flat",
+    )
+    style.map("Dialog.TButton", background=[("active", accent)])
+    style.configure(
+        "Accent.TButton",
+        background=accent,
+        foreground="white",
+        font=("Segoe UI", 10, "bold"),
+        relief="flat",
+    )
+    style.map(
+        "Accent.TButton",
+        background=[("active", "#5ab0ff" if dark_mode_enabled else "#3399ff")],
+    )
 
     selected_name = tk.StringVar()
     open_excel_choice = tk.StringVar(value="YES")
@@ -533,41 +746,29 @@ def get_responsible_person() -> Tuple[str, bool]:
     window.protocol("WM_DELETE_WINDOW", on_cancel)
     window.bind("<Escape>", lambda e: on_cancel())
 
-    header = tk.Label(
+    header = ttk.Label(
         window,
         text="👤 Select Responsible Person",
-        font=("Segoe UI", 14, "bold"),
-        fg=fg,
-        bg=bg,
+        style="DialogHeader.TLabel",
     )
     header.grid(row=0, column=0, columnspan=2, pady=(0, 12), sticky="w")
 
-    def hover_effect(widget: tk.Widget, enter_color: str, leave_color: str) -> None:
-        widget.bind("<Enter>", lambda e: widget.config(bg=enter_color))
-        widget.bind("<Leave>", lambda e: widget.config(bg=leave_color))
-
     # TODO: For public GitHub, keep these generic. Customize in your local fork.
     names = ["Team Member 1", "Team Member 2", "Team Member 3"]
     for i, name in enumerate(names, start=1):
-        btn = tk.Button(
+        btn = ttk.Button(
             window,
             text=name,
             width=28,
-            font=("Segoe UI", 10, "bold"),
-            bg=btn_bg,
-            fg=fg,
-            relief="flat",
+            style="Dialog.TButton",
             command=lambda n=name: (selected_name.set(n), window.destroy()),
         )
         btn.grid(row=i, column=0, pady=3, sticky="w")
-        hover_effect(btn, accent, btn_bg)
 
-    manual_label = tk.Label(
+    manual_label = ttk.Label(
         window,
         text="✍️ Or enter your name:",
-        font=("Segoe UI", 10),
-        fg=subtle,
-        bg=bg,
+        style="DialogSubtle.TLabel",
     )
     manual_label.grid(row=5, column=0, pady=(14, 4), sticky="w")
 
@@ -575,9 +776,7 @@ def get_responsible_person() -> Tuple[str, bool]:
     entry.grid(row=6, column=0, pady=4, sticky="w")
     entry.focus_set()
 
-    feedback = tk.Label(
-        window, text="", font=("Segoe UI", 9), fg="#ff6666", bg=bg
-    )
+    feedback = ttk.Label(window, text="", style="DialogFeedback.TLabel")
     feedback.grid(row=7, column=0, sticky="w")
 
     def do_confirm() -> None:
@@ -589,57 +788,42 @@ def get_responsible_person() -> Tuple[str, bool]:
         selected_name.set(name_val)
         window.destroy()
 
-    confirm_btn = tk.Button(
+    confirm_btn = ttk.Button(
         window,
         text="Confirm",
-        font=("Segoe UI", 10, "bold"),
-        bg=accent,
-        fg="white",
-        relief="flat",
+        style="Accent.TButton",
         command=do_confirm,
     )
     confirm_btn.grid(row=8, column=0, pady=(10, 0), sticky="w")
-    hover_effect(
-        confirm_btn,
-        "#5ab0ff" if dark_mode_enabled else "#3399ff",
-        accent,
-    )
 
-    excel_label = tk.Label(
+    excel_label = ttk.Label(
         window,
         text="📊 Open auto-generated\nExcel file?",
-        font=("Segoe UI", 10, "bold"),
-        fg=fg,
-        bg=bg,
+        style="DialogBold.TLabel",
     )
     excel_label.grid(row=1, column=1, rowspan=1, padx=18, sticky="nw")
 
-    yes_radio = tk.Radiobutton(
+    yes_radio = ttk.Radiobutton(
         window,
         text="YES",
         variable=open_excel_choice,
         value="YES",
-        font=("Segoe UI", 10),
-        bg=bg,
-        fg=fg,
-        selectcolor=bg,
+        style="Dialog.TRadiobutton",
     )
     yes_radio.grid(row=2, column=1, sticky="nw", padx=18)
 
-    no_radio = tk.Radiobutton(
+    no_radio = ttk.Radiobutton(
         window,
         text="NO",
         variable=open_excel_choice,
         value="NO",
-        font=("Segoe UI", 10),
-        bg=bg,
-        fg=fg,
-        selectcolor=bg,
+        style="Dialog.TRadiobutton",
     )
     no_radio.grid(row=3, column=1, sticky="nw", padx=18)
 
     window.bind("<Return>", lambda e: do_confirm())
 
+    # Single geometry pass once all widgets are in place
     window.update_idletasks()
     w, h = 520, 320
     try:
@@ -654,10 +838,60 @@ def get_responsible_person() -> Tuple[str, bool]:
     return selected_name.get(), (open_excel_choice.get() == "YES")
 
 
+def _open_exported_file(
+    temp_filename: str,
+    logger: logging.Logger | None,
+    parent: tk.Misc | None = None,
+) -> None:
+    """
+    Open the exported workbook with the system's default application.
+
+    Safe to run on a worker thread when `parent` is given: error dialogs are
+    then scheduled on the Tk main loop via `parent.after` instead of being
+    shown directly.
+    """
+
+    def _show_error(title: str, message: str) -> None:
+        if parent is None:
+            messagebox.showerror(title, message)
+        else:
+            parent.after(0, lambda: messagebox.showerror(title, message))
+
+    try:
+        os.startfile(temp_filename)  # type: ignore[attr-defined]
+        if logger:
+            logger.info("Excel opened: %s", temp_filename)
+    except FileNotFoundError as e:
+        _show_error(
+            "Open Error",
+            "Cannot find the exported file:\n"
+            f"{temp_filename}\n\nDetails:\n{e}",
+        )
+        if logger:
+            logger.error("Open failed (FileNotFoundError): %s", e)
+    except OSError as e:
+        _show_error(
+            "Open Error",
+            "Cannot open Excel for:\n"
+            f"{temp_filename}\n\nDetails:\n{e}",
+        )
+        if logger:
+            logger.error("Open failed (OSError): %s", e)
+    except Exception as e:
+        _show_error(
+            "Open Error",
+            f"Unexpected error while opening Excel:\n{e}",
+        )
+        if logger:
+            logger.error("Open failed (unexpected): %s", e)
+
+
 def run_metadata_export(
     file_paths: List[str],
     responsible_person: str,
     open_excel: bool,
+    parent: tk.Misc | None = None,
+    pdf_bpid: str | None = None,
 ) -> None:
     """
     Build an Excel-based tracking sheet using selected CSV and PDF files.
@@ -666,31 +900,16 @@ def run_metadata_export(
         file_paths: List of selected CSV and PDF file paths.
         responsible_person: Name of the responsible person.
         open_excel: Whether to open Excel automatically after export.
+        parent: Tk widget used to report errors from the background thread
+            that opens Excel. Without it, Excel is opened synchronously.
+        pdf_bpid: BPID of the first PDF if the caller already extracted it;
+            otherwise it is read from the PDF here.
     """
-    try:
-        logger = logging.getLogger("SmartDocs.Export")
-        if not logger.handlers:
-            log_path = os.path.join(
-                os.path.dirname(os.path.abspath(__file__)), "SmartDocs.log"
-            )
-            logging.basicConfig(
-                filename=log_path,
-                level=logging.INFO,
-                format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-            )
-        debug_mode = os.getenv("SMARTDOCS_DEBUG", "0") == "1"
-        if debug_mode:
-            logger.setLevel(logging.DEBUG)
-            logger.debug("run_metadata_export() started.")
-    except Exception:
-        logger = None
-
-    csv_files = [f for f in file_paths if f.lower().endswith(".csv")]
-    pdf_files = [f for f in file_paths if f.lower().endswith(".pdf")]
+    logger = _EXPORT_LOGGER
+    if logger:
+        logger.debug("run_metadata_export() started.")
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "TemporaryData"
+    csv_files, pdf_files = split_invoice_files(file_paths)
 
     headers = [
         "Lp.",
@@ -710,14 +929,29 @@ def run_metadata_export(
         "Comments",
         "RESPONSIBLE PERSON",
     ]
-    ws.append(headers)
 
     status_text = "Requested"
     lt_text = "Invoice Created"
     today = datetime.today().strftime("%Y-%m-%d")
     counter = 1
 
-    pdf_bpid = extract_bpid_from_pdf(pdf_files[0]) if pdf_files else ""
+    # Columns from "Status" onwards are identical for every row
+    static_tail = [
+        status_text,
+        lt_text,
+        today,
+        today,
+        "",
+        "",
+        "",
+        responsible_person,
+    ]
+
+    # The GUI passes the BPID it already extracted while validating the
+    # selection, so the PDF is only parsed here for standalone calls.
+    if pdf_bpid is None:
+        pdf_bpid = extract_bpid_from_pdf(pdf_files[0]) if pdf_files else ""
+    csv_results = [extract_csv_metadata(f) for f in csv_files]
 
     if logger:
         try:
@@ -730,9 +964,14 @@ def run_metadata_export(
         except Exception:
             pass
 
+    rows: List[list] = []
+    # Column widths are tracked as rows are built; the writer cannot read
+    # cells back once they have been flushed.
+    col_widths = [len(h) for h in headers]
+    # Clipboard gets every column except "Lp." for rows with a customer name
+    clipboard_parts: List[str] = []
     total_rows_added = 0
-    for file_path in csv_files:
-        client, inv, po_so_pairs, error = extract_csv_metadata(file_path)
+    for file_path, (client, inv, po_so_pairs, error) in zip(csv_files, csv_results):
         if logger:
             try:
                 logger.debug(
@@ -746,14 +985,8 @@ def run_metadata_export(
             except Exception:
                 pass
 
-        seen_pairs = set()
-        unique_po_so_pairs: List[Tuple[str, str]] = []
+        # Pairs are already unique per file (see extract_csv_po_so)
         for po, so in po_so_pairs:
-            if (po, so) not in seen_pairs:
-                seen_pairs.add((po, so))
-                unique_po_so_pairs.append((po, so))
-
-        for po, so in unique_po_so_pairs:
             row_data = [
                 counter,
                 client,
@@ -763,31 +996,20 @@ def run_metadata_export(
                 inv,
                 po,
                 so,
-                status_text,
-                lt_text,
-                today,
-                today,
-                "",
-                "",
-                "",
-                responsible_person,
+                *static_tail,
+            ]
+            rows.append(row_data)
+            col_widths = [
+                max(w, len(str(v)) if v is not None else 0)
+                for w, v in zip(col_widths, row_data)
             ]
-            ws.append(row_data)
+            if client:
+                clipboard_parts.append(
+                    "\t".join(str(v) if v is not None else "" for v in row_data[1:])
+                )
             counter += 1
             total_rows_added += 1
 
-    try:
-        for col in ws.columns:
-            max_length = 0
-            col_letter = col[0].column_letter
-            for cell in col:
-                if cell.value is not None:
-                    max_length = max(max_length, len(str(cell.value)))
-            ws.column_dimensions[col_letter].width = max_length + 2
-    except Exception as e:
-        if logger:
-            logger.warning("Column autosize warning: %s", e)
-
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     temp_filename = f"TEMP_Metadata_Export_{timestamp}.xlsx"
 
@@ -800,8 +1022,18 @@ def run_metadata_export(
             pass
 
     try:
-        wb.save(temp_filename)
-    except PermissionError as e:
+        # constant_memory flushes each row to disk as soon as it is written,
+        # so peak memory stays flat regardless of the export size.
+        # The context manager closes the workbook (and its temp files) even if
+        # a write fails; errors raised on close are still caught below.
+        with xlsxwriter.Workbook(temp_filename, {"constant_memory": True}) as wb:
+            ws = wb.add_worksheet("TemporaryData")
+            for col_idx, width in enumerate(col_widths):
+                ws.set_column(col_idx, col_idx, width + 2)
+            ws.write_row(0, 0, headers)
+            for row_idx, row_data in enumerate(rows, start=1):
+                ws.write_row(row_idx, 0, row_data)
+    except (PermissionError, FileCreateError) as e:
         messagebox.showerror(
             "Cannot Save File",
             "The export file could not be saved (file may be in use or locked).\n\n"
@@ -820,18 +1052,7 @@ def run_metadata_export(
             logger.error("Save failed due to unexpected error: %s", e)
         return
 
-    clipboard_data = ""
-    for row in ws.iter_rows(
-        min_row=2,
-        max_row=ws.max_row,
-        min_col=2,
-        max_col=ws.max_column,
-        values_only=True,
-    ):
-        if row[0] not in (None, ""):
-            clipboard_data += "\t".join(
-                [str(cell) if cell is not None else "" for cell in row]
-            ) + "\n"
+    clipboard_data = "\n".join(clipboard_parts) + ("\n" if clipboard_parts else "")
 
     try:
         pyperclip.copy(clipboard_data)
@@ -843,33 +1064,15 @@ def run_metadata_export(
 
     skip_open = os.getenv("SMARTDOCS_SKIP_OPEN", "0") == "1"
     if open_excel and not skip_open:
-        try:
-            os.startfile(temp_filename)  # type: ignore[attr-defined]
-            if logger:
-                logger.info("Excel opened: %s", temp_filename)
-        except FileNotFoundError as e:
-            messagebox.showerror(
-                "Open Error",
-                "Cannot find the exported file:\n"
-                f"{temp_filename}\n\nDetails:\n{e}",
-            )
-            if logger:
-                logger.error("Open failed (FileNotFoundError): %s", e)
-        except OSError as e:
-            messagebox.showerror(
-                "Open Error",
-                "Cannot open Excel for:\n"
-                f"{temp_filename}\n\nDetails:\n{e}",
-            )
-            if logger:
-                logger.error("Open failed (OSError): %s", e)
-        except Exception as e:
-            messagebox.showerror(
-                "Open Error",
-                f"Unexpected error while opening Excel:\n{e}",
-            )
-            if logger:
-                logger.error("Open failed (unexpected): %s", e)
+        if parent is None:
+            _open_exported_file(temp_filename, logger)
+        else:
+            # Launching Excel can stall; keep the GUI responsive meanwhile
+            threading.Thread(
+                target=_open_exported_file,
+                args=(temp_filename, logger, parent),
+                daemon=True,
+            ).start()
     elif logger:
         logger.info(
             "Open skipped (open_excel=%s, SMARTDOCS_SKIP_OPEN=%s)",
@@ -882,6 +1085,47 @@ def run_metadata_export(
 # Main GUI – SmartDocs Insight
 # ---------------------------------------------------------------------------
 
+# Main window color palettes, keyed by dark_mode
+_DARK_PALETTE = {
+    "bg": "#1e1e1e",
+    "fg": "#ffffff",
+    "secondary": "#cccccc",
+    "text_bg": "#2e2e2e",
+    "text_fg": "#ffffff",
+    "insert_color": "#ffffff",
+    "button_bg": "#444444",
+    "scrollbar_bg": "#444444",
+    "scrollbar_trough": "#2e2e2e",
+}
+_LIGHT_PALETTE = {
+    "bg": "#f4f4f4",
+    "fg": "#333333",
+    "secondary": "#888888",
+    "text_bg": "white",
+    "text_fg": "#000000",
+    "insert_color": "#000000",
+    "button_bg": "#dddddd",
+    "scrollbar_bg": "#cccccc",
+    "scrollbar_trough": "#eeeeee",
+}
+_PALETTES = {True: _DARK_PALETTE, False: _LIGHT_PALETTE}
+
+# Font used to size list modals; created lazily because it needs a Tk root
+_MEASURE_FONT: tkfont.Font | None = None
+
+
+def _mousewheel_win(event: tk.Event, widget: tk.Text) -> str:
+    """Scroll a text widget on Windows/macOS <MouseWheel> events."""
+    widget.yview_scroll(int(-1 * (event.delta // 120)), "units")
+    return "break"
+
+
+def _mousewheel_linux(event: tk.Event, widget: tk.Text) -> str:
+    """Scroll a text widget on X11 <Button-4>/<Button-5> events."""
+    direction = -1 if event.num == 4 else 1
+    widget.yview_scroll(direction, "units")
+    return "break"
+
 
 def show_gui() -> None:
     """
@@ -918,88 +1162,111 @@ def show_gui() -> None:
 
     dark_mode = initial_dark_mode
     enable_excel_export = tk.BooleanVar(value=True)
-    selected_color = tk.StringVar(value="#0078D7")
-
-    try:
-        if os.path.exists(prefs_file_path):
-            with open(prefs_file_path, "r", encoding="utf-8") as f:
-                prefs = json.load(f)
-            selected_color.set(prefs.get("button_color", "#0078D7"))
-        else:
-            selected_color.set("#0078D7")
-    except Exception:
-        selected_color.set("#0078D7")
+    selected_color = tk.StringVar(value=_prefs_cache.get("button_color", "#0078D7"))
 
     style = ttk.Style(root)
 
+    # (palette, accent) last applied; lets apply_theme skip redundant passes
+    applied_theme: Tuple[dict, str] | None = None
+
     def apply_theme() -> None:
-        bg = "#1e1e1e" if dark_mode else "#f4f4f4"
-        fg = "#ffffff" if dark_mode else "#333333"
+        nonlocal applied_theme
+        p = _PALETTES[bool(dark_mode)]
         accent = selected_color.get()
-        secondary = "#cccccc" if dark_mode else "#888888"
-        text_bg = "#2e2e2e" if dark_mode else "white"
-        text_fg = "#ffffff" if dark_mode else "#000000"
-        insert_color = "#ffffff" if dark_mode else "#000000"
-        button_bg = "#444444" if dark_mode else "#dddddd"
-        scrollbar_bg = "#444444" if dark_mode else "#cccccc"
-        scrollbar_trough = "#2e2e2e" if dark_mode else "#eeeeee"
-
-        root.configure(bg=bg)
-
-        for frame in [header_frame, button_frame, info_frame, footer_frame]:
-            frame.configure(bg=bg)
-
-        label.config(bg=bg, fg=fg)
-        subheader.config(bg=bg, fg=secondary)
-
-        button.config(bg=accent, fg="white", activebackground=accent)
-        excel_checkbox.config(bg=bg, fg=fg, activebackground=accent, selectcolor=bg)
-        doc_button.config(bg=button_bg, fg=fg, activebackground=accent)
-
-        summary_label.config(bg=bg, fg=fg)
-        email_label.config(bg=bg, fg=secondary)
-        copy_button.config(bg=button_bg, fg=fg, activebackground=accent)
-
-        text_area.config(
-            bg=text_bg,
-            fg=text_fg,
-            insertbackground=insert_color,
-        )
-
-        copy_output_button.config(
-            bg=button_bg,
-            fg=fg,
-            activebackground=accent,
-        )
-
-        toggle_button.config(
-            bg=button_bg,
-            fg=fg,
-            activebackground=accent,
-        )
-
-        processing_label.config(bg=bg, fg=secondary)
+        if applied_theme == (p, accent):
+            return
+        applied_theme = (p, accent)
+
+        bg, fg, secondary = p["bg"], p["fg"], p["secondary"]
+        button_opts = {"bg": p["button_bg"], "fg": fg, "activebackground": accent}
+
+        for widget, options in (
+            (root, {"bg": bg}),
+            (header_frame, {"bg": bg}),
+            (button_frame, {"bg": bg}),
+            (info_frame, {"bg": bg}),
+            (footer_frame, {"bg": bg}),
+            (label, {"bg": bg, "fg": fg}),
+            (subheader, {"bg": bg, "fg": secondary}),
+            (button, {"bg": accent, "fg": "white", "activebackground": accent}),
+            (
+                excel_checkbox,
+                {"bg": bg, "fg": fg, "activebackground": accent, "selectcolor": bg},
+            ),
+            (doc_button, button_opts),
+            (summary_label, {"bg": bg, "fg": fg}),
+            (email_label, {"bg": bg, "fg": secondary}),
+            (copy_button, button_opts),
+            (
+                text_area,
+                {
+                    "bg": p["text_bg"],
+                    "fg": p["text_fg"],
+                    "insertbackground": p["insert_color"],
+                },
+            ),
+            (copy_output_button, button_opts),
+            (toggle_button, button_opts),
+            (processing_label, {"bg": bg, "fg": secondary}),
+        ):
+            widget.configure(**options)
 
         style.theme_use("default")
         style.configure(
             "Vertical.TScrollbar",
-            background=scrollbar_bg,
-            troughcolor=scrollbar_trough,
+            background=p["scrollbar_bg"],
+            troughcolor=p["scrollbar_trough"],
             arrowcolor=accent,
-            bordercolor=scrollbar_bg,
+            bordercolor=p["scrollbar_bg"],
         )
 
+    # Pending after() id for the debounced dark-mode save
+    dark_mode_save_job = None
+
+    def flush_dark_mode_preference() -> None:
+        nonlocal dark_mode_save_job
+        dark_mode_save_job = None
+        save_dark_mode_preference(dark_mode)
+
     def toggle_dark_mode() -> None:
-        nonlocal dark_mode
+        nonlocal dark_mode, dark_mode_save_job
         dark_mode = not dark_mode
         toggle_button.config(text="☀️ Light Mode" if dark_mode else "🌙 Dark Mode")
         apply_theme()
-        save_dark_mode_preference(dark_mode)
+        # Rapid toggles collapse into a single write of the final state
+        if dark_mode_save_job is not None:
+            root.after_cancel(dark_mode_save_job)
+        dark_mode_save_job = root.after(500, flush_dark_mode_preference)
+
+    def on_close() -> None:
+        if dark_mode_save_job is not None:
+            root.after_cancel(dark_mode_save_job)
+            flush_dark_mode_preference()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # Latest status text and whether a flush is already queued; bursts of
+    # updates collapse into a single label redraw on the next idle pass.
+    pending_status = None
+    status_flush_scheduled = False
+
+    def _flush_status() -> None:
+        nonlocal status_flush_scheduled
+        status_flush_scheduled = False
+        processing_label.config(text=pending_status)
+
+    def _set_status(text: str) -> None:
+        nonlocal pending_status, status_flush_scheduled
+        pending_status = text
+        if not status_flush_scheduled:
+            status_flush_scheduled = True
+            root.after_idle(_flush_status)
 
     def handle_reset_shortcut(event: tk.Event) -> None:
         if reset_invoice_analysis_counter():
-            processing_label.config(
-                text="Counter reset to 0\nTotal documentation analyzed by the user: 0"
+            _set_status(
+                "Counter reset to 0\nTotal documentation analyzed by the user: 0"
             )
 
     root.bind("<Shift-R>", handle_reset_shortcut)
@@ -1013,23 +1280,9 @@ def show_gui() -> None:
         webbrowser.open(DEFAULT_DOC_URL)
 
     def select_files() -> None:
-        try:
-            logger = logging.getLogger("SmartDocs.Select")
-            if not logger.handlers:
-                log_path = os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)), "SmartDocs.log"
-                )
-                logging.basicConfig(
-                    filename=log_path,
-                    level=logging.INFO,
-                    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-                )
-            debug_mode = os.getenv("SMARTDOCS_DEBUG", "0") == "1"
-            if debug_mode:
-                logger.setLevel(logging.DEBUG)
-                logger.debug("select_files() started.")
-        except Exception:
-            logger = None
+        logger = _SELECT_LOGGER
+        if logger:
+            logger.debug("select_files() started.")
 
         start_time = time.time()
 
@@ -1043,8 +1296,7 @@ def show_gui() -> None:
                 logger.info("No files selected.")
             return
 
-        csv_files = [f for f in file_paths if f.lower().endswith(".csv")]
-        pdf_files = [f for f in file_paths if f.lower().endswith(".pdf")]
+        csv_files, pdf_files = split_invoice_files(file_paths)
 
         if logger:
             try:
@@ -1052,64 +1304,94 @@ def show_gui() -> None:
             except Exception:
                 pass
 
-        if csv_files and pdf_files:
+        if not csv_files or not pdf_files:
+            if logger:
+                logger.info("Missing file types: either CSV or PDF not provided.")
+            messagebox.showwarning(
+                "Missing File Types",
+                "Please select both CSV and PDF files.",
+            )
+            return
+
+        def _check_selection() -> Tuple[
+            Tuple[Callable[..., object], str, str] | None, str
+        ]:
+            """
+            Verify that the CSVs and PDFs belong to one invoice and customer.
+            Runs on the worker thread, so a mismatch is returned as
+            (dialog function, title, message) instead of being shown here.
+
+            Returns:
+                tuple:
+                    rejection: mismatch dialog arguments, or None if consistent
+                    first_pdf_bpid: BPID of the first PDF, reused by the export
+            """
 
             def _sig(path: str) -> str:
                 base = os.path.basename(path)
-                base = re.sub(r"\(.*?\)", "", base)
+                base = _SIG_PAREN_RE.sub("", base)
                 base = os.path.splitext(base)[0]
-                base = base.replace("INV_CSV_", "").replace("INV_PDF_D_", "")
+                # Strip first: a leading tag like "(1) " leaves a space that would
+                # keep the anchored prefix pattern from matching.
+                base = _INV_PREFIX_RE.sub("", base.strip(), count=1)
                 return base.strip()
 
             csv_sigs = {_sig(f) for f in csv_files}
             pdf_sigs = {_sig(f) for f in pdf_files}
 
-            if csv_sigs != pdf_sigs:
+            # Only the unmatched signatures are reported; listing every
+            # signature makes the dialog unreadable for large selections.
+            only_csv = sorted(csv_sigs - pdf_sigs)
+            only_pdf = sorted(pdf_sigs - csv_sigs)
+
+            if only_csv or only_pdf:
+                shared_count = len(csv_sigs & pdf_sigs)
                 if logger:
                     logger.warning(
-                        "Invoice signature mismatch. CSV=%s, PDF=%s",
-                        csv_sigs,
-                        pdf_sigs,
+                        "Invoice signature mismatch. Only CSV=%s, only PDF=%s, shared=%d",
+                        only_csv,
+                        only_pdf,
+                        shared_count,
                     )
-                messagebox.showerror(
+                rejection = (
+                    messagebox.showerror,
                     "Invoice Mismatch",
                     "The selected CSV and PDF files do NOT belong to the same invoice.\n\n"
-                    f"CSV invoice signatures detected:\n {', '.join(sorted(csv_sigs))}\n\n"
-                    f"PDF invoice signatures detected:\n {', '.join(sorted(pdf_sigs))}\n\n"
+                    f"CSV invoice signatures without a PDF:\n {', '.join(only_csv) or '-'}\n\n"
+                    f"PDF invoice signatures without a CSV:\n {', '.join(only_pdf) or '-'}\n\n"
+                    f"Matching invoice signatures: {shared_count}\n\n"
                     "Please select files belonging to the SAME invoice number.",
                 )
-                return
-
-            pdf_bpids = [extract_bpid_from_pdf(f) for f in pdf_files]
-            pdf_bpids = [b for b in pdf_bpids if b]
-
-            if len(set(pdf_bpids)) > 1:
+                return rejection, ""
+
+            # PDFs are read one at a time: PyMuPDF is not thread-safe and holds
+            # the GIL, so a thread pool would risk crashes for no speedup.
+            # Stop as soon as two different BPIDs are seen; the rest of the
+            # PDFs cannot change the outcome.
+            pdf_bpids: Set[str] = set()
+            first_pdf_bpid = ""
+            for idx, f in enumerate(pdf_files):
+                bpid = extract_bpid_from_pdf(f)
+                if idx == 0:
+                    first_pdf_bpid = bpid
+                if bpid:
+                    pdf_bpids.add(bpid)
+                    if len(pdf_bpids) > 1:
+                        break
+
+            if len(pdf_bpids) > 1:
                 if logger:
-                    logger.warning("BPID mismatch detected: %s", pdf_bpids)
-                messagebox.showwarning(
+                    logger.warning("BPID mismatch detected: %s", sorted(pdf_bpids))
+                rejection = (
+                    messagebox.showwarning,
                     "BPID Mismatch",
                     "The BPID values extracted from the selected PDF files are not the same.\n"
                     "Please verify that you selected the correct files belonging to the same customer.\n\n",
                 )
-                return
-
-        if not csv_files or not pdf_files:
-            if logger:
-                logger.info("Missing file types: either CSV or PDF not provided.")
-            messagebox.showwarning(
-                "Missing File Types",
-                "Please select both CSV and PDF files.",
-            )
-            return
+                return rejection, first_pdf_bpid
 
-        all_non_eu_items: List[str] = []
-        all_eu_items: List[str] = []
-        all_po_numbers: List[str] = []
-        all_invoice_numbers: List[str] = []
-        total_weight = 0.0
+            return None, first_pdf_bpid
 
-        all_missing_coo: List[str] = []
-        file_issues: List[str] = []
         multiple_files = len(csv_files) > 1
 
         def _show_list_modal(
@@ -1117,13 +1399,13 @@ def show_gui() -> None:
             lines: List[str],
             bullet: str = "🔸",
         ) -> None:
+            global _MEASURE_FONT
+
             if os.getenv("SMARTDOCS_SKIP_ALERTS", "0") == "1":
                 if logger:
                     logger.info("Alert skipped (%s); items=%d", title, len(lines))
                 return
 
-            import tkinter.font as tkfont
-
             dark_bg = "#1e1e1e" if initial_dark_mode else "#f4f4f4"
             dark_txt = "#ffffff" if initial_dark_mode else "#000000"
             accent_color = "#3399ff" if initial_dark_mode else "#0078D7"
@@ -1167,24 +1449,28 @@ def show_gui() -> None:
                 pady=10,
                 highlightthickness=1,
                 highlightbackground=dark_bg,
+                undo=False,
             )
             txt.pack(fill="both", expand=True)
 
-            for line in safe_lines:
-                txt.insert(tk.END, f"{bullet} {line}\n\n")
-
-            def _on_mousewheel_windows(event: tk.Event) -> str:
-                txt.yview_scroll(int(-1 * (event.delta // 120)), "units")
-                return "break"
-
-            def _on_mousewheel_linux(event: tk.Event) -> str:
-                direction = -1 if event.num == 4 else 1
-                txt.yview_scroll(direction, "units")
-                return "break"
+            # One insert per chunk instead of per line; very long lists are
+            # split so the window can repaint between chunks.
+            chunk_size = 1000 if len(safe_lines) > 5000 else len(safe_lines)
+            for start in range(0, len(safe_lines), chunk_size):
+                txt.insert(
+                    tk.END,
+                    "".join(
+                        f"{bullet} {line}\n\n"
+                        for line in safe_lines[start : start + chunk_size]
+                    ),
+                )
+                if chunk_size < len(safe_lines):
+                    alert.update_idletasks()
+            txt.configure(state="disabled")
 
-            txt.bind("<MouseWheel>", _on_mousewheel_windows)
-            txt.bind("<Button-4>", _on_mousewheel_linux)
-            txt.bind("<Button-5>", _on_mousewheel_linux)
+            txt.bind("<MouseWheel>", lambda e, w=txt: _mousewheel_win(e, w))
+            txt.bind("<Button-4>", lambda e, w=txt: _mousewheel_linux(e, w))
+            txt.bind("<Button-5>", lambda e, w=txt: _mousewheel_linux(e, w))
 
             btns = tk.Frame(alert, bg=dark_bg)
             btns.grid(row=2, column=0, sticky="ew", padx=22, pady=(8, 18))
@@ -1238,24 +1524,32 @@ def show_gui() -> None:
             )
             close_btn.grid(row=0, column=2, sticky="e")
 
-            font = tkfont.Font(font=("Segoe UI", 10))
-            longest_px = 0
-            for line in safe_lines:
-                px = font.measure(f"{bullet} {line}")
-                if px > longest_px:
-                    longest_px = px
+            sw, sh = alert.winfo_screenwidth(), alert.winfo_screenheight()
+
+            if len(safe_lines) > 200:
+                # Long lists always hit the height clamp; skip measuring them
+                win_w, win_h = int(sw * 0.70), int(sh * 0.70)
+            else:
+                if _MEASURE_FONT is None:
+                    _MEASURE_FONT = tkfont.Font(font=("Segoe UI", 10))
+                font = _MEASURE_FONT
+                # Pixel width tracks character count closely for a single font, so
+                # only the longest lines are measured instead of every line.
+                candidates = heapq.nlargest(32, safe_lines, key=len)
+                longest_px = max(
+                    font.measure(f"{bullet} {line}") for line in candidates
+                )
 
-            desired_w = int(longest_px * 1.3) + (22 + 22) + 20
-            line_h = max(18, font.metrics("linespace") + 2)
-            n_items = max(1, len(safe_lines))
-            desired_h = (18 + 12) + n_items * (line_h + 4) + (8 + 42 + 18)
+                desired_w = int(longest_px * 1.3) + (22 + 22) + 20
+                line_h = max(18, font.metrics("linespace") + 2)
+                n_items = max(1, len(safe_lines))
+                desired_h = (18 + 12) + n_items * (line_h + 4) + (8 + 42 + 18)
 
-            sw, sh = alert.winfo_screenwidth(), alert.winfo_screenheight()
-            min_w, min_h = 520, 260
-            max_w, max_h = int(sw * 0.80), int(sh * 0.80)
+                min_w, min_h = 520, 260
+                max_w, max_h = int(sw * 0.80), int(sh * 0.80)
 
-            win_w = max(min_w, min(max_w, desired_w))
-            win_h = max(min_h, min(max_h, desired_h))
+                win_w = max(min_w, min(max_w, desired_w))
+                win_h = max(min_h, min(max_h, desired_h))
 
             alert.geometry(f"{win_w}x{win_h}+0+0")
 
@@ -1276,181 +1570,252 @@ def show_gui() -> None:
 
             alert.wait_window()
 
-        for file_path in csv_files:
-            try:
-                non_eu, eu, weight, box5, invoice, missing_coo = analyze_invoice(
-                    file_path
-                )
-            except Exception as e:
-                file_issues.append(
-                    f"{os.path.basename(file_path)} → Unexpected error: {e}"
-                )
-                if logger:
-                    logger.error(
-                        "analyze_invoice crashed for %s: %s", file_path, e
+        def _do_analysis(csv_files: List[str], cache_rows: bool) -> dict:
+            """
+            Parse the CSVs and build the email body. Runs on a worker thread,
+            so it must not touch any Tk widget. Rows are only cached when an
+            export will read them again.
+            """
+            all_non_eu_items: List[str] = []
+            # EU items and references repeat across invoices; keep them unique as they arrive
+            all_eu_items: Set[str] = set()
+            all_po_numbers: Set[str] = set()
+            all_invoice_numbers: Set[str] = set()
+            total_weight = 0.0
+
+            all_missing_coo: List[str] = []
+            file_issues: List[str] = []
+
+            analysis_results = (_safe_analyze(f, cache_rows) for f in csv_files)
+            for file_path, ok, payload in analysis_results:
+                bn = os.path.basename(file_path)
+                if not ok:
+                    e = payload
+                    file_issues.append(
+                        f"{bn} → Unexpected error: {e}"
                     )
-                continue
+                    if logger:
+                        logger.error(
+                            "analyze_invoice crashed for %s: %s", file_path, e
+                        )
+                    continue
 
-            all_non_eu_items.extend(non_eu)
-            all_eu_items.extend(eu)
-
-            if box5 != "Unknown":
-                all_po_numbers.append(box5)
-            if invoice != "Unknown":
-                all_invoice_numbers.append(invoice)
-
-            total_weight += weight
-
-            if missing_coo:
-                errs = [
-                    x
-                    for x in missing_coo
-                    if str(x).startswith("Error during analysis:")
-                ]
-                misses = [
-                    x
-                    for x in missing_coo
-                    if not str(x).startswith("Error during analysis:")
-                ]
-
-                file_issues.extend(
-                    [
-                        f"{os.path.basename(file_path)} → {e}"
-                        for e in errs
-                    ]
-                )
+                non_eu, eu, weight, box5, invoice, missing_coo = payload
 
-                if misses:
-                    if multiple_files:
-                        all_missing_coo.append(
-                            f"📄 {os.path.basename(file_path)}"
-                        )
+                all_non_eu_items.extend(non_eu)
+                all_eu_items.update(eu)
 
-                    for entry in misses:
-                        core = entry.replace("⚠️ Missing COO → ", "")
-                        parts = [p.strip() for p in core.split("\n")]
-
-                        line_num = ""
-                        product = ""
-                        desc = ""
-                        weight_txt = ""
-
-                        for p in parts:
-                            up = p.upper()
-                            if up.startswith("LINE"):
-                                line_num = p.split(" ", 1)[1].strip()
-                            elif up.startswith("PRODUCT:"):
-                                product = p.split(":", 1)[1].strip()
-                            elif up.startswith("DESC:"):
-                                desc = p.split(":", 1)[1].strip()
-                            elif up.startswith("WEIGHT:"):
-                                weight_txt = p.split(":", 1)[1].strip()
-
-                        if "/" in weight_txt:
-                            weight_txt = weight_txt.split("/")[-1].strip()
-                        weight_txt = " ".join(weight_txt.split())
-
-                        all_missing_coo.append(
-                            f"Line {line_num} – {product}, {desc}, {weight_txt}"
-                        )
+                if box5 != "Unknown":
+                    all_po_numbers.add(box5)
+                if invoice != "Unknown":
+                    all_invoice_numbers.add(invoice)
 
-        if logger:
-            try:
-                logger.info(
-                    "Totals → NonEU=%d, EU=%d, POs=%d, Invoices=%d, Weight=%.3fKG, "
-                    "MissingCOO=%d, Issues=%d",
-                    len(all_non_eu_items),
-                    len(all_eu_items),
-                    len(set(all_po_numbers)),
-                    len(set(all_invoice_numbers)),
-                    round(total_weight, 3),
-                    len(all_missing_coo),
-                    len(file_issues),
-                )
-            except Exception:
-                pass
+                total_weight += weight
 
-        box5_list = (
-            ", ".join(sorted(set(all_po_numbers))) if all_po_numbers else "Unknown"
-        )
-        invoice_list = (
-            ", ".join(sorted(set(all_invoice_numbers)))
-            if all_invoice_numbers
-            else "Unknown"
-        )
+                if missing_coo:
+                    errs: List[str] = []
+                    misses: List[str] = []
+                    for x in missing_coo:
+                        if str(x).startswith(_ANALYSIS_ERROR_PREFIX):
+                            errs.append(x)
+                        else:
+                            misses.append(x)
 
-        message = (
-            "Dear Team,\n\n"
-            "Please proceed requesting the respective Certificate of Origin for the attached invoices.\n\n"
-        )
+                    file_issues.extend(f"{bn} → {e}" for e in errs)
 
-        message += "Non-EU items:\n"
-        for i, item in enumerate(all_non_eu_items, 1):
-            message += f"{i}. {item}\n"
+                    if misses:
+                        if multiple_files:
+                            all_missing_coo.append(f"📄 {bn}")
 
-        message += f"\nReference: inv. {invoice_list}\n"
-        message += f"Weight: {round(total_weight, 3)} KG\n"
-        message += f"Box 5: {box5_list}\n\n"
+                        for entry in misses:
+                            core = entry.replace("⚠️ Missing COO → ", "")
+                            parts = [p.strip() for p in core.split("\n")]
 
-        message += "EU items:\n"
-        for i, item in enumerate(sorted(set(all_eu_items)), 1):
-            message += f"{i}. {item}\n"
+                            fields = {"LINE": "", "PRODUCT": "", "DESC": "", "WEIGHT": ""}
+                            for p in parts:
+                                m = _COO_FIELD_RE.match(p)
+                                if m:
+                                    fields[m.group(1).upper()] = m.group(2).strip()
 
-        message += (
-            "\nBest regards,\n"
-            "Customer Care Team\n"
-            f"Email: {DEFAULT_SUPPORT_EMAIL}\n"
-            f"Phone: {DEFAULT_SUPPORT_PHONE_URL}\n"
-        )
+                            line_num = fields["LINE"]
+                            product = fields["PRODUCT"]
+                            desc = fields["DESC"]
+                            weight_txt = fields["WEIGHT"].rpartition("/")[2]
+                            weight_txt = " ".join(weight_txt.split())
 
-        increment_invoice_analysis_counter()
-        updated_count = get_invoice_analysis_count()
-        elapsed_time = round(time.time() - start_time, 2)
+                            all_missing_coo.append(
+                                f"Line {line_num} – {product}, {desc}, {weight_txt}"
+                            )
 
-        processing_label.config(
-            text=(
-                "⏱️ Processing Completed\n"
-                f"Duration: {elapsed_time} seconds\n"
-                f"Total Invoices Analyzed: {updated_count}"
+            if logger:
+                try:
+                    logger.info(
+                        "Totals → NonEU=%d, EU=%d, POs=%d, Invoices=%d, Weight=%.3fKG, "
+                        "MissingCOO=%d, Issues=%d",
+                        len(all_non_eu_items),
+                        len(all_eu_items),
+                        len(all_po_numbers),
+                        len(all_invoice_numbers),
+                        round(total_weight, 3),
+                        len(all_missing_coo),
+                        len(file_issues),
+                    )
+                except Exception:
+                    pass
+
+            box5_list = (
+                ", ".join(sorted(all_po_numbers)) if all_po_numbers else "Unknown"
+            )
+            invoice_list = (
+                ", ".join(sorted(all_invoice_numbers))
+                if all_invoice_numbers
+                else "Unknown"
             )
-        )
 
-        text_area.configure(state="normal")
-        text_area.delete("1.0", tk.END)
-        text_area.insert(tk.END, message)
-        text_area.configure(state="normal")
+            message_parts = [
+                "Dear Team,\n\n"
+                "Please proceed requesting the respective Certificate of Origin for the attached invoices.\n\n",
+                "Non-EU items:\n",
+            ]
+            message_parts.extend(
+                f"{i}. {item}\n" for i, item in enumerate(all_non_eu_items, 1)
+            )
 
-        if all_missing_coo:
-            if logger:
-                logger.debug(
-                    "Showing Missing COO modal; items=%d", len(all_missing_coo)
-                )
-            _show_list_modal(
-                "Missing COO encountered — manual check required",
-                all_missing_coo,
-                bullet="🔸",
+            message_parts.append(
+                f"\nReference: inv. {invoice_list}\n"
+                f"Weight: {round(total_weight, 3)} KG\n"
+                f"Box 5: {box5_list}\n\n"
+                "EU items:\n"
+            )
+            message_parts.extend(
+                f"{i}. {item}\n" for i, item in enumerate(sorted(all_eu_items), 1)
             )
 
-        if file_issues:
-            if logger:
-                logger.debug(
-                    "Showing File Issues modal; items=%d", len(file_issues)
-                )
-            _show_list_modal(
-                "⚠️ File Issues detected — please review",
-                file_issues,
-                bullet="❗",
+            message_parts.append(
+                "\nBest regards,\n"
+                "Customer Care Team\n"
+                f"Email: {DEFAULT_SUPPORT_EMAIL}\n"
+                f"Phone: {DEFAULT_SUPPORT_PHONE_URL}\n"
             )
+            message = "".join(message_parts)
+
+            return {
+                "message": message,
+                "missing_coo": all_missing_coo,
+                "file_issues": file_issues,
+            }
 
-        if enable_excel_export.get():
-            user_name, should_open_excel = get_responsible_person()
-            if not user_name:
-                processing_label.config(
-                    text="Tracking list generation: Cancelled by user"
+        def _apply_results(results: dict) -> None:
+            """
+            Publish analysis results to the GUI. Runs on the Tk thread.
+            """
+            button.config(state="normal")
+
+            try:
+                increment_invoice_analysis_counter()
+                updated_count = get_invoice_analysis_count()
+                elapsed_time = round(time.time() - start_time, 2)
+
+                _set_status(
+                    "⏱️ Processing Completed\n"
+                    f"Duration: {elapsed_time} seconds\n"
+                    f"Total Invoices Analyzed: {updated_count}"
                 )
-                return
 
-            run_metadata_export(file_paths, user_name, should_open_excel)
+                text_area.configure(state="normal")
+                text_area.delete("1.0", tk.END)
+                text_area.insert("1.0", results["message"])
+
+                all_missing_coo = results["missing_coo"]
+                if all_missing_coo:
+                    if logger:
+                        logger.debug(
+                            "Showing Missing COO modal; items=%d",
+                            len(all_missing_coo),
+                        )
+                    _show_list_modal(
+                        "Missing COO encountered — manual check required",
+                        all_missing_coo,
+                        bullet="🔸",
+                    )
+
+                file_issues = results["file_issues"]
+                if file_issues:
+                    if logger:
+                        logger.debug(
+                            "Showing File Issues modal; items=%d",
+                            len(file_issues),
+                        )
+                    _show_list_modal(
+                        "⚠️ File Issues detected — please review",
+                        file_issues,
+                        bullet="❗",
+                    )
+
+                # The export stays on the Tk thread: it reports through message
+                # boxes, reuses the BPID found during validation and finds the
+                # CSV rows already cached.
+                if enable_excel_export.get():
+                    user_name, should_open_excel = get_responsible_person()
+                    if user_name:
+                        run_metadata_export(
+                            file_paths,
+                            user_name,
+                            should_open_excel,
+                            parent=root,
+                            pdf_bpid=results["pdf_bpid"],
+                        )
+                    else:
+                        _set_status("Tracking list generation: Cancelled by user")
+            finally:
+                # The row cache only bridges the analysis and the export; do
+                # not keep parsed invoices alive for the rest of the session,
+                # even if a dialog or the export raised.
+                _read_csv_rows.cache_clear()
+
+        def _selection_rejected(
+            show: Callable[..., object], title: str, message: str
+        ) -> None:
+            button.config(state="normal")
+            _set_status(
+                "Status: Awaiting File Selection\n"
+                f"Total Invoices Processed: {get_invoice_analysis_count()}"
+            )
+            show(title, message)
+
+        def _analysis_failed(error: Exception) -> None:
+            _read_csv_rows.cache_clear()
+            button.config(state="normal")
+            _set_status("⚠️ Analysis failed — see error details")
+            messagebox.showerror(
+                "Analysis Error",
+                f"Unexpected error while analyzing the selected files:\n{error}",
+            )
+
+        def _worker() -> None:
+            try:
+                rejection, first_pdf_bpid = _check_selection()
+                if rejection is not None:
+                    root.after(0, _selection_rejected, *rejection)
+                    return
+                results = _do_analysis(csv_files, cache_rows)
+                results["pdf_bpid"] = first_pdf_bpid
+            except Exception as e:
+                if logger:
+                    logger.exception("Analysis failed: %s", e)
+                root.after(0, _analysis_failed, e)
+                return
+            root.after(0, _apply_results, results)
+
+        # Keep the window responsive while PDFs and CSVs are parsed; results
+        # and mismatch dialogs are marshalled back to the Tk thread with
+        # root.after.
+        # Tk variables must be read on this thread; only an export reuses the
+        # parsed rows, so the analysis skips the cache otherwise.
+        cache_rows = enable_excel_export.get()
+        button.config(state="disabled")
+        _set_status("⏳ Processing selected files...")
+        threading.Thread(target=_worker, daemon=True).start()
 
     header_frame = tk.Frame(root)
     header_frame.pack(pady=20)